@@ -1,9 +1,8 @@
 import streamlit as st
 from src.redis_memory import RedisMemory
 from src.rag_chain import RAGPipeline
-from src.qdrant_client import QdrantVectorStore
-from src.embeddings import EmbeddingGenerator
-import time
+from src.qdrant_client import QdrantVectorStore, search_cache
+from src.embeddings import EmbeddingGenerator, embedding_cache
 from dotenv import load_dotenv
 import os
 import uuid
@@ -62,6 +61,8 @@ def init_components(session_id: str) -> tuple[RAGPipeline, RedisMemory]:
         vector_db = QdrantVectorStore()
         if not vector_db.collection_exists():
             vector_db.create_collection()
+        else:
+            vector_db.validate_collection()
         
         return (
             RAGPipeline(),
@@ -73,12 +74,12 @@ def init_components(session_id: str) -> tuple[RAGPipeline, RedisMemory]:
 
 def display_chat_history(memory: RedisMemory) -> None:
     """Display chat history in sidebar"""
-    history = memory.get_history()
+    history = memory.get_history(limit=8)  # Show last 8 messages
     if not history:
         st.caption("No conversations yet")
         return
     
-    for i, msg in enumerate(history[-8:]):  # Show last 8 messages
+    for i, msg in enumerate(history):
         with st.expander(f"💬 Chat {i+1}", expanded=False):
             if msg['user']:
                 st.markdown(f"**Q:** {msg['user'][:60]}...")
@@ -87,8 +88,8 @@ def display_chat_history(memory: RedisMemory) -> None:
 
 def display_main_chat(memory: RedisMemory) -> None:
     """Display main chat messages"""
-    history = memory.get_history()
-    for msg in history[-6:]:  # Show last 6 messages in main view
+    history = memory.get_history(limit=6)
+    for msg in history:  # Show last 6 messages in main view
         if msg['user']:
             with st.chat_message("user"):
                 st.write(msg['user'])
@@ -97,24 +98,14 @@ def display_main_chat(memory: RedisMemory) -> None:
                 st.write(msg['assistant'])
 
 def generate_and_display_response(rag: RAGPipeline, prompt: str) -> Dict[str, Any]:
-    """Generate response and display with smooth streaming effect"""
+    """Generate response and stream it to the chat as tokens arrive"""
     message_placeholder = st.empty()
-    full_response = ""
     
     # Generate response
-    response = rag.generate_response(prompt)
+    response = rag.generate_response_stream(prompt)
     
-    # Stream the response with typing effect
-    words = response["answer"].split()
-    for i, word in enumerate(words):
-        full_response += word + " "
-        time.sleep(0.05)  # Smooth typing speed
-        
-        # Add typing indicator
-        if i < len(words) - 1:
-            message_placeholder.markdown(full_response + "⏳")
-        else:
-            message_placeholder.markdown(full_response)
+    # Render chunks as the LLM produces them; write_stream returns the full text
+    response["answer"] = message_placeholder.write_stream(response["answer"])
     
     return response
 
@@ -164,8 +155,16 @@ def main():
         # Stats
         st.markdown("---")
         st.subheader("📊 Stats")
-        history_count = len(memory.get_history())
+        history_count = memory.count()
         st.metric("Messages", history_count)
+        
+        embed_stats = embedding_cache.stats()
+        search_stats = search_cache.stats()
+        col1, col2 = st.columns(2)
+        col1.metric("Embedding cache", f"{embed_stats['hit_rate']:.0%}",
+                    help=f"{embed_stats['hits']} hits / {embed_stats['misses']} misses")
+        col2.metric("Search cache", f"{search_stats['hit_rate']:.0%}",
+                    help=f"{search_stats['hits']} hits / {search_stats['misses']} misses")
     
     # Main chat interface
     st.title("E-Commerce Support")
@@ -1,42 +1,57 @@
 import pandas as pd
-from typing import List, Dict, Any
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from typing import List, Dict, Any, Iterable, Iterator
 
 def load_dataset(file_path: str) -> List[Dict[str, Any]]:
-    """Load the FAQ dataset from CSV and convert to list of dictionaries."""
+    """
+    Load the FAQ dataset from CSV and convert to list of dictionaries.
+    
+    Values are already Qdrant-compatible (native Python types, None for
+    missing), so chunks built from them can be uploaded with
+    upload_data(..., clean=False).
+    """
     df = pd.read_csv(file_path)
-    return df.to_dict('records')
+    return _clean_frame(df).to_dict('records')
 
-def chunk_data(
-    data: List[Dict[str, Any]], 
+def _clean_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Map NaN to None and numpy scalars to Python natives, column-wise"""
+    # Object dtype boxes numpy scalars as Python natives; NaN becomes None
+    return df.astype(object).where(df.notna(), None)
+
+def iter_chunks(
+    data: Iterable[Dict[str, Any]], 
     chunk_size: int = 1000, 
     chunk_overlap: int = 200
-) -> List[Dict[str, Any]]:
+) -> Iterator[Dict[str, Any]]:
     """
     Split FAQ entries into smaller chunks for better retrieval.
     
+    Chunks are yielded one at a time so ingestion can stream them straight
+    into batched uploads without holding the whole corpus in memory.
+    
     Args:
-        data: List of FAQ items (each with Question, Answer, Category)
+        data: FAQ items (each with Question, Answer, Category)
         chunk_size: Maximum size of each chunk in characters
         chunk_overlap: Overlap between chunks in characters
     
-    Returns:
-        List of chunked documents with metadata
+    Yields:
+        Chunked documents with metadata
     """
+    # Imported here so loading and cleaning the CSV doesn't need langchain
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         length_function=len
     )
     
-    chunks = []
     for item in data:
         # Combine question and answer for chunking
         text = f"Question: {item['Question']}\nAnswer: {item['Answer']}"
         splits = text_splitter.split_text(text)
         
         for i, split in enumerate(splits):
-            chunk = {
+            yield {
                 "text": split,
                 "metadata": {
                     "category": item["Category"],
@@ -45,6 +60,11 @@ def chunk_data(
                     "total_chunks": len(splits)
                 }
             }
-            chunks.append(chunk)
-    
-    return chunks
\ No newline at end of file
+
+def chunk_data(
+    data: List[Dict[str, Any]], 
+    chunk_size: int = 1000, 
+    chunk_overlap: int = 200
+) -> List[Dict[str, Any]]:
+    """List-returning wrapper around iter_chunks for callers that need it."""
+    return list(iter_chunks(data, chunk_size=chunk_size, chunk_overlap=chunk_overlap))
\ No newline at end of file
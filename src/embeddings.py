@@ -3,12 +3,18 @@
 
 # New import
 from langchain_openai import OpenAIEmbeddings
-from typing import List
+from src.query_cache import QueryCache
+from typing import Any, Iterable, Iterator, List
+import numpy as np
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Module state outlives Streamlit reruns, so this is shared across reruns and
+# sessions alike. Embeddings never go stale; the TTL only bounds memory.
+embedding_cache = QueryCache(max_size=2000, ttl=3600)
+
 class EmbeddingGenerator:
     def __init__(self):
         self.embeddings = OpenAIEmbeddings(
@@ -16,7 +22,7 @@ class EmbeddingGenerator:
             openai_api_key=os.getenv("OPENAI_API_KEY")
         )
     
-    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
         """
         Generate embeddings for a list of text strings.
         
@@ -24,9 +30,9 @@ class EmbeddingGenerator:
             texts: List of text strings to embed
             
         Returns:
-            List of embedding vectors
+            Contiguous float32 array of shape (len(texts), dim)
         """
-        return self.embeddings.embed_documents(texts)
+        return np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
     
     def generate_embedding(self, text: str) -> List[float]:
         """
@@ -38,4 +44,64 @@ class EmbeddingGenerator:
         Returns:
             Embedding vector
         """
-        return self.embeddings.embed_query(text)
\ No newline at end of file
+        key = embedding_cache.make_key(QueryCache.normalize(text))
+        cached = embedding_cache.get(key)
+        if cached is not None:
+            return cached.tolist()
+        embedding = self.embeddings.embed_query(text)
+        # Stored as float32: ~6 KB per entry instead of ~49 KB of Python floats
+        embedding_cache.set(key, np.asarray(embedding, dtype=np.float32))
+        return embedding
+    
+    async def agenerate_embedding(self, text: str) -> List[float]:
+        """Async variant of generate_embedding, sharing the same cache."""
+        key = embedding_cache.make_key(QueryCache.normalize(text))
+        cached = embedding_cache.get(key)
+        if cached is not None:
+            return cached.tolist()
+        embedding = await self.embeddings.aembed_query(text)
+        # Stored as float32: ~6 KB per entry instead of ~49 KB of Python floats
+        embedding_cache.set(key, np.asarray(embedding, dtype=np.float32))
+        return embedding
+
+class SparseEmbeddingGenerator:
+    def __init__(self, model_name: str = "Qdrant/bm25"):
+        """
+        Local BM25 sparse embeddings for keyword matching in hybrid search.
+        
+        Args:
+            model_name: fastembed sparse model to load
+        """
+        # Optional dependency: only hybrid search needs it
+        try:
+            from fastembed import SparseTextEmbedding
+        except ImportError as e:
+            raise ImportError(
+                "Hybrid search needs fastembed: install the 'hybrid' extra "
+                "(uv sync --extra hybrid) or pip install fastembed"
+            ) from e
+        self.model = SparseTextEmbedding(model_name=model_name)
+    
+    def generate_embeddings(self, texts: Iterable[str]) -> Iterator[Any]:
+        """
+        Generate sparse embeddings for documents, lazily and in batches.
+        
+        Args:
+            texts: Text strings to embed
+            
+        Returns:
+            Iterator of sparse embeddings (indices/values arrays)
+        """
+        return self.model.embed(texts)
+    
+    def generate_embedding(self, text: str) -> Any:
+        """
+        Generate sparse embedding for a search query.
+        
+        Args:
+            text: Query string to embed
+            
+        Returns:
+            Sparse embedding (indices/values arrays)
+        """
+        return next(iter(self.model.query_embed(text)))
\ No newline at end of file
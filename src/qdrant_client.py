@@ -1,16 +1,45 @@
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.http import models
-from typing import List, Dict, Any, Optional
+from src.query_cache import QueryCache
+from typing import TYPE_CHECKING, List, Dict, Any, Iterable, Optional, Union
+from itertools import count
+from weakref import WeakKeyDictionary
+import asyncio
 import os
 from dotenv import load_dotenv
 import warnings
 import numpy as np
 
+if TYPE_CHECKING:
+    from src.embeddings import SparseEmbeddingGenerator
+
 # Suppress insecure connection warnings
 warnings.filterwarnings("ignore", message="Api key is used with an insecure connection")
 
 load_dotenv()
 
+# Named vectors: OpenAI embeddings for meaning, BM25 for exact keywords
+DENSE_VECTOR_NAME = "text-dense"
+SPARSE_VECTOR_NAME = "text-sparse"
+
+# Candidates fetched from each vector before rank fusion in hybrid_search
+HYBRID_PREFETCH_LIMIT = 20
+
+# Segment size (in KB of vectors) above which Qdrant builds the HNSW index
+INDEXING_THRESHOLD = 20000
+
+# Search the INT8 quantized index, then rescore the oversampled top hits
+# against the original vectors to keep ranking accuracy
+QUANTIZED_SEARCH_PARAMS = models.SearchParams(
+    quantization=models.QuantizationSearchParams(
+        rescore=True,
+        oversampling=2.0
+    )
+)
+
+# Search results are reused for repeated questions until the collection changes
+search_cache = QueryCache(max_size=2000, ttl=300)
+
 def clean_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
     """Convert all metadata values to Qdrant-compatible formats"""
     cleaned = {}
@@ -20,8 +49,12 @@ def clean_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
             cleaned[key] = None
             continue
             
+        # Convert numpy booleans to Python bool
+        if isinstance(value, np.bool_):
+            cleaned[key] = bool(value)
+            
         # Convert numpy numbers to Python native types
-        if isinstance(value, np.number):
+        elif isinstance(value, np.number):
             cleaned[key] = float(value) if isinstance(value, np.floating) else int(value)
             
         # Convert numeric strings to actual numbers
@@ -42,21 +75,51 @@ def clean_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
     return cleaned
 
 class QdrantVectorStore:
-    def __init__(self, collection_name: str = "ecommerce_faq"):
+    def __init__(self, collection_name: str = "ecommerce_faq", location: Optional[str] = None):
         """
         Initialize Qdrant vector store client.
         
         Args:
             collection_name: Name of the collection to use/create
+            location: Local-mode location instead of the QDRANT_URL server
+                (":memory:" or a directory path), e.g. for tests
         """
-        qdrant_url = os.getenv("QDRANT_URL", "http://localhost:6333")
-        self.client = QdrantClient(
-            url=qdrant_url,
-            api_key=os.getenv("QDRANT_API_KEY"),
-            prefer_grpc=False,  # Disable GRPC to avoid number conversion issues
-            timeout=10.0
-        )
+        if location is not None:
+            self._client_kwargs = dict(location=location)
+        else:
+            # gRPC rejects numpy values in payloads; upload_data runs clean_metadata
+            # unless called with clean=False
+            self._client_kwargs = dict(
+                url=os.getenv("QDRANT_URL", "http://localhost:6333"),
+                api_key=os.getenv("QDRANT_API_KEY"),
+                prefer_grpc=True,
+                grpc_port=int(os.getenv("QDRANT_GRPC_PORT", 6334)),
+                timeout=10.0
+            )
+        self.client = QdrantClient(**self._client_kwargs)
+        # Async clients are bound to the event loop they were first used on
+        self._async_clients: "WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncQdrantClient]" = WeakKeyDictionary()
         self.collection_name = collection_name
+        self._sparse_embedder: Optional["SparseEmbeddingGenerator"] = None
+    
+    @property
+    def async_client(self) -> AsyncQdrantClient:
+        """AsyncQdrantClient for the running event loop, created on first use"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncQdrantClient(**self._client_kwargs)
+            self._async_clients[loop] = client
+        return client
+    
+    @property
+    def sparse_embedder(self) -> "SparseEmbeddingGenerator":
+        """BM25 model for hybrid queries, loaded on first use"""
+        if self._sparse_embedder is None:
+            # Imported here so the store doesn't pull in langchain/fastembed
+            from src.embeddings import SparseEmbeddingGenerator
+            self._sparse_embedder = SparseEmbeddingGenerator()
+        return self._sparse_embedder
     
     def collection_exists(self) -> bool:
         """Check if collection already exists"""
@@ -66,76 +129,168 @@ class QdrantVectorStore:
         except:
             return False
     
+    def validate_collection(self) -> None:
+        """
+        Fail fast if the collection predates the named dense/sparse vectors.
+        
+        Raises:
+            RuntimeError: With migration steps, if searches would fail with
+                "vector text-dense not configured"
+        """
+        vectors = self.client.get_collection(self.collection_name).config.params.vectors
+        if not isinstance(vectors, dict) or DENSE_VECTOR_NAME not in vectors:
+            raise RuntimeError(
+                f"Collection '{self.collection_name}' uses the old unnamed vector layout. "
+                f"Delete it (e.g. client.delete_collection('{self.collection_name}')), "
+                "restart the app to recreate it, then re-run ingestion."
+            )
+    
     def create_collection(self, vector_size: int = 1536) -> None:
         """
-        Create or recreate a collection with optimized settings.
+        Create a collection with optimized settings.
+        
+        Fails if the collection already exists (check collection_exists()
+        first).
         
         Args:
             vector_size: Dimension of the vectors (1536 for text-embedding-ada-002)
         """
-        self.client.recreate_collection(
+        self.client.create_collection(
             collection_name=self.collection_name,
-            vectors_config=models.VectorParams(
-                size=vector_size,
-                distance=models.Distance.COSINE
-            ),
+            vectors_config={
+                DENSE_VECTOR_NAME: models.VectorParams(
+                    size=vector_size,
+                    distance=models.Distance.COSINE
+                )
+            },
+            sparse_vectors_config={
+                SPARSE_VECTOR_NAME: models.SparseVectorParams(
+                    index=models.SparseIndexParams(),
+                    modifier=models.Modifier.IDF  # BM25 needs IDF applied server-side
+                )
+            },
             optimizers_config=models.OptimizersConfigDiff(
-                indexing_threshold=20000,
+                indexing_threshold=INDEXING_THRESHOLD,
                 memmap_threshold=20000
+            ),
+            hnsw_config=models.HnswConfigDiff(
+                m=32,
+                ef_construct=256,
+                on_disk=False
+            ),
+            quantization_config=models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=True
+                )
             )
         )
+        
+        # Index the category filter used by hybrid_search so it isn't a full scan
+        self.client.create_payload_index(
+            collection_name=self.collection_name,
+            field_name="category",
+            field_schema=models.PayloadSchemaType.KEYWORD
+        )
     
     def upload_data(
         self, 
-        texts: List[str], 
-        embeddings: List[List[float]], 
-        metadatas: List[Dict[str, Any]],
-        batch_size: int = 100
+        texts: Iterable[str], 
+        embeddings: Union[np.ndarray, Iterable[List[float]]], 
+        metadatas: Iterable[Dict[str, Any]],
+        sparse_embeddings: Optional[Iterable[Any]] = None,
+        batch_size: int = 100,
+        clean: bool = True,
+        parallel: int = 1
     ) -> None:
         """
         Upload documents with embeddings to Qdrant.
         
+        Uses the client's bulk upload_collection path: an (N, dim) ndarray of
+        embeddings is sliced into per-batch views and only converted to lists
+        at the wire boundary. Texts and metadata are consumed lazily, so
+        generators (e.g. from iter_chunks) never need to be materialized.
+        
         Args:
-            texts: List of document texts
-            embeddings: List of corresponding embeddings
-            metadatas: List of metadata dictionaries
+            texts: Document texts
+            embeddings: Corresponding embeddings, ideally the float32 array
+                from EmbeddingGenerator.generate_embeddings
+            metadatas: Metadata dictionaries
+            sparse_embeddings: BM25 embeddings from
+                SparseEmbeddingGenerator.generate_embeddings; without them
+                points only match the dense half of hybrid_search
             batch_size: Number of points to upload at once
+            clean: Run clean_metadata on each entry. Chunks from
+                load_dataset/iter_chunks are already clean, so ingestion of
+                those can pass False to skip the per-entry pass
+            parallel: Number of upload worker processes; values above 1 start a
+                multiprocessing pool, so only use them for large bulk loads run
+                under an `if __name__ == "__main__"` guard
         """
-        # Clean all metadata first
-        cleaned_metadatas = [clean_metadata(md) for md in metadatas]
-        
-        # Prepare payloads
-        payloads = [
+        # Clean metadata and prepare payloads as they are consumed
+        payloads = (
             {
                 "text": text,
-                **metadata
+                **(clean_metadata(metadata) if clean else metadata)
             }
-            for text, metadata in zip(texts, cleaned_metadatas)
-        ]
+            for text, metadata in zip(texts, metadatas)
+        )
         
-        # Upload in batches
-        for i in range(0, len(embeddings), batch_size):
-            batch_points = [
-                models.PointStruct(
-                    id=idx,
-                    vector=embedding,
-                    payload=payload
-                )
-                for idx, (embedding, payload) in enumerate(
-                    zip(embeddings[i:i+batch_size], payloads[i:i+batch_size]),
-                    start=i
-                )
-            ]
+        # Dense-only arrays go up as batch views; otherwise build per-point vectors,
+        # converting each row (a view for ndarray input) to a list in C
+        if sparse_embeddings is None and isinstance(embeddings, np.ndarray):
+            vectors = {DENSE_VECTOR_NAME: embeddings}
+        elif sparse_embeddings is None:
+            vectors = (
+                {DENSE_VECTOR_NAME: np.asarray(embedding, dtype=np.float32).tolist()}
+                for embedding in embeddings
+            )
+        else:
+            vectors = (
+                {
+                    DENSE_VECTOR_NAME: np.asarray(embedding, dtype=np.float32).tolist(),
+                    SPARSE_VECTOR_NAME: models.SparseVector(
+                        indices=sparse.indices.tolist(),
+                        values=sparse.values.tolist()
+                    )
+                }
+                for embedding, sparse in zip(embeddings, sparse_embeddings)
+            )
+        
+        # Pause HNSW indexing so segments aren't re-indexed while points stream in
+        self._set_indexing_threshold(0)
+        try:
+            self.client.upload_collection(
+                collection_name=self.collection_name,
+                vectors=vectors,
+                payload=payloads,
+                ids=count(),  # Sequential ids; stops with the shortest input
+                batch_size=batch_size,
+                parallel=parallel
+            )
+        except Exception as e:
+            print(f"Error uploading data: {str(e)}")
+            raise
+        finally:
+            # Cached results no longer reflect the collection contents
+            search_cache.clear()
             
+            # Build the HNSW index now that the points are in, even after a failure;
+            # a restore error is logged so it doesn't mask the upload error
             try:
-                self.client.upload_points(
-                    collection_name=self.collection_name,
-                    points=batch_points
-                )
+                self._set_indexing_threshold(INDEXING_THRESHOLD)
             except Exception as e:
-                print(f"Error uploading batch {i//batch_size}: {str(e)}")
-                print("Problematic batch sample:", batch_points[0] if batch_points else "Empty")
-                raise
+                print(f"Error restoring indexing threshold: {str(e)}")
+    
+    def _set_indexing_threshold(self, threshold: int) -> None:
+        """Update the collection's HNSW indexing threshold (0 disables indexing)"""
+        self.client.update_collection(
+            collection_name=self.collection_name,
+            optimizers_config=models.OptimizersConfigDiff(
+                indexing_threshold=threshold
+            )
+        )
     
     def hybrid_search(
         self, 
@@ -146,6 +301,10 @@ class QdrantVectorStore:
     ) -> List[Dict[str, Any]]:
         """
         Perform hybrid search (vector + keyword) on Qdrant.
+        
+        Dense and BM25 sparse candidates are fetched in one request and
+        merged with Reciprocal Rank Fusion, so scores are fusion ranks
+        rather than cosine similarities.
         """
         # Build filter if category is specified
         search_filter = models.Filter(
@@ -157,26 +316,36 @@ class QdrantVectorStore:
             ]
         ) if category_filter else None
         
+        sparse = self.sparse_embedder.generate_embedding(query)
+        
         # Execute search
-        results = self.client.search(
+        results = self.client.query_points(
             collection_name=self.collection_name,
-            query_vector=query_embedding,
-            query_text=query,
+            prefetch=[
+                models.Prefetch(
+                    query=query_embedding,
+                    using=DENSE_VECTOR_NAME,
+                    params=QUANTIZED_SEARCH_PARAMS,
+                    filter=search_filter,
+                    limit=HYBRID_PREFETCH_LIMIT
+                ),
+                models.Prefetch(
+                    query=models.SparseVector(
+                        indices=sparse.indices.tolist(),
+                        values=sparse.values.tolist()
+                    ),
+                    using=SPARSE_VECTOR_NAME,
+                    filter=search_filter,
+                    limit=HYBRID_PREFETCH_LIMIT
+                )
+            ],
+            query=models.FusionQuery(fusion=models.Fusion.RRF),
             limit=limit,
             with_payload=True,
-            with_vectors=False,
-            filter=search_filter
+            with_vectors=False
         )
         
-        return [
-            {
-                "text": result.payload["text"],
-                "metadata": {k: v for k, v in result.payload.items() if k != "text"},
-                "score": result.score,
-                "id": result.id
-            }
-            for result in results
-        ]
+        return [self._format_hit(result) for result in results.points]
     
     def semantic_search(
         self, 
@@ -197,31 +366,133 @@ class QdrantVectorStore:
         Returns:
             List of filtered and formatted results
         """
-        # Perform initial vector search
-        results = self.client.search(
+        cache_key = self._search_cache_key(query_embedding, query, threshold, limit)
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return self._copy_results(cached)
+        
+        # Perform vector search
+        results = self.client.query_points(
             collection_name=self.collection_name,
-            query_vector=query_embedding,
-            limit=limit*2,  # Get more results than needed for filtering
+            query=query_embedding,
+            using=DENSE_VECTOR_NAME,
+            limit=limit,
+            score_threshold=threshold,  # Qdrant drops weaker hits during the scan
+            search_params=QUANTIZED_SEARCH_PARAMS,
             with_payload=True,
             with_vectors=False
         )
         
-        # Filter by similarity score and format results
-        filtered_results = []
-        for hit in results:
-            if hit.score >= threshold:
-                filtered_results.append({
-                    "text": hit.payload["text"],
-                    "metadata": {k: v for k, v in hit.payload.items() if k != "text"},
-                    "score": hit.score,
-                    "id": hit.id
-                })
-                
-                # Stop when we reach the limit
-                if len(filtered_results) >= limit:
-                    break
+        filtered_results = [self._format_hit(hit) for hit in results.points]
+        search_cache.set(cache_key, filtered_results)
+        return self._copy_results(filtered_results)
+
+    async def asemantic_search(
+        self, 
+        query_embedding: List[float],
+        query: Optional[str] = None,
+        threshold: float = 0.7,
+        limit: int = 3
+    ) -> List[Dict[str, Any]]:
+        """Async variant of semantic_search using AsyncQdrantClient."""
+        cache_key = self._search_cache_key(query_embedding, query, threshold, limit)
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return self._copy_results(cached)
+        
+        results = await self.async_client.query_points(
+            collection_name=self.collection_name,
+            query=query_embedding,
+            using=DENSE_VECTOR_NAME,
+            limit=limit,
+            score_threshold=threshold,  # Qdrant drops weaker hits during the scan
+            search_params=QUANTIZED_SEARCH_PARAMS,
+            with_payload=True,
+            with_vectors=False
+        )
         
-        return filtered_results
+        filtered_results = [self._format_hit(hit) for hit in results.points]
+        search_cache.set(cache_key, filtered_results)
+        return self._copy_results(filtered_results)
+
+    def _search_cache_key(
+        self,
+        query_embedding: List[float],
+        query: Optional[str],
+        threshold: float,
+        limit: int
+    ) -> str:
+        """Cache key for a search, preferring the query text over the vector"""
+        if query is not None:
+            query_key = QueryCache.normalize(query)
+        else:
+            query_key = np.round(np.asarray(query_embedding, dtype=np.float32), 4).tobytes()
+        return search_cache.make_key(self.collection_name, query_key, threshold, limit)
+
+    @staticmethod
+    def _copy_results(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Copy cached results so callers can't modify the entries shared
+        across sessions.
+        """
+        return [dict(r, metadata=dict(r["metadata"])) for r in results]
+
+    @staticmethod
+    def _format_hit(hit: models.ScoredPoint) -> Dict[str, Any]:
+        """
+        Format a search hit. The payload is freshly deserialized per
+        response, so it's reused as the metadata dict instead of copied.
+        """
+        metadata = hit.payload
+        text = metadata.pop("text", "")
+        return {
+            "text": text,
+            "metadata": metadata,
+            "score": hit.score,
+            "id": hit.id
+        }
+
+    def batch_semantic_search(
+        self,
+        query_embeddings: List[List[float]],
+        threshold: float = 0.7,
+        limit: int = 3
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Run several semantic searches in a single request to Qdrant.
+        
+        Args:
+            query_embeddings: Vector embeddings, one per query
+            threshold: Minimum similarity score (0.0-1.0)
+            limit: Maximum number of results to return per query
+            
+        Returns:
+            One list of formatted results per query, in input order
+        """
+        if not query_embeddings:
+            return []
+        
+        requests = [
+            models.QueryRequest(
+                query=embedding,
+                using=DENSE_VECTOR_NAME,
+                limit=limit,
+                score_threshold=threshold,
+                params=QUANTIZED_SEARCH_PARAMS,
+                with_payload=True,
+                with_vector=False
+            )
+            for embedding in query_embeddings
+        ]
+        responses = self.client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=requests
+        )
+        
+        return [
+            [self._format_hit(hit) for hit in response.points]
+            for response in responses
+        ]
 
     def search(
         self,
@@ -0,0 +1,68 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import hashlib
+import threading
+import time
+
+class QueryCache:
+    def __init__(self, max_size: int = 2000, ttl: float = 300):
+        """
+        Thread-safe LRU cache with per-entry expiry for query results.
+
+        Args:
+            max_size: Maximum number of entries kept before evicting the oldest
+            ttl: Seconds an entry stays valid after being stored
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Lowercase and collapse whitespace so trivial variants share an entry"""
+        return " ".join(query.lower().split())
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Build a fixed-size cache key from arbitrary hashable parts"""
+        return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        """Store value under key, evicting the least recently used entry if full"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "hit_rate": self.hits / total if total else 0.0
+            }
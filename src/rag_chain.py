@@ -1,16 +1,29 @@
-from langchain.chains import LLMChain
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
+from langchain_core.output_parsers import StrOutputParser
 from src.embeddings import EmbeddingGenerator
 from src.qdrant_client import QdrantVectorStore
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional, Tuple, Union
 import os
 from dotenv import load_dotenv
+import asyncio
 import random
+import re
+from concurrent.futures import ThreadPoolExecutor
 
 load_dotenv()
 
+# Qdrant/LLM throughput saturates at around two in-flight requests per worker
+MAX_CONCURRENT_REQUESTS = 2
+
 class RAGPipeline:
+    # Whole-message greetings only, so "hire" or "hi, where is my order?" still hit RAG
+    _GREETING_RE = re.compile(
+        r"^\s*(hello|hi|hey|greetings|good (morning|afternoon|evening)"
+        r"|namaste|salam|hola|hi there|helloo)[\s!?.,]*$",
+        re.IGNORECASE
+    )
+
     def __init__(self, collection_name: str = "ecommerce_faq"):
         """Initialize the RAG pipeline with vector store and LLM"""
         self.embedder = EmbeddingGenerator()
@@ -22,24 +35,28 @@ class RAGPipeline:
                 model_name="gpt-4",
                 temperature=0.3,
                 openai_api_key=os.getenv("OPENAI_API_KEY"),
-                request_timeout=30
+                request_timeout=30,
+                streaming=True
             )
         except Exception as e:
             raise RuntimeError(f"Failed to initialize LLM: {str(e)}")
 
+        # Per-instance RNG so sessions don't contend on the global random state
+        self._rng = random.Random()
+        
         # Greeting responses
-        self.greeting_responses = [
+        self.greeting_responses = (
             "🛍️ Welcome to [Brand] Support! How can I help with:\n- Orders\n- Returns\n- Payments\n- Account issues",
             "👋 Hello! I'm your shopping assistant. What can I help you with today?",
             "🌟 Welcome back! Need help with your recent order or account?"
-        ]
+        )
         
         # Fallback responses
-        self.fallback_responses = [
+        self.fallback_responses = (
             "Let me check... I couldn't find exact information, but try:\n1. Our help center: [link]\n2. Email support@example.com",
             "I'm still learning about this. For immediate help:\n• Visit our FAQ\n• Contact live chat",
             "This topic isn't in my knowledge base yet. Our team can help at support@example.com"
-        ]
+        )
 
         # Optimized prompt template
         self.prompt_template = PromptTemplate(
@@ -64,53 +81,183 @@ class RAGPipeline:
             FINAL ANSWER:
             """
         )
+        
+        # Build the chain once; it supports both invoke() and stream()
+        self._chain = self.prompt_template | self.llm | StrOutputParser()
 
     def generate_response(self, query: str) -> Dict[str, any]:
         """Generate context-aware response with semantic search"""
         try:
-            # Handle greetings
-            if self._is_greeting(query):
-                return {
-                    "answer": random.choice(self.greeting_responses),
-                    "sources": []
-                }
-            
-            # Generate embedding and search
-            query_embedding = self.embedder.generate_embedding(query)
-            results = self.vector_db.search(
-                query_embedding=query_embedding,
-                query=query,
-                mode="semantic",
-                threshold=0.65,
-                limit=3
-            )
-            
-            # Handle no results
-            if not results:
-                return {
-                    "answer": random.choice(self.fallback_responses),
-                    "sources": []
-                }
-            
-            # Prepare enhanced context
-            context = self._format_context(results, query)
+            results = None if self._is_greeting(query) else self._retrieve(query)
+            prepared = self._prepare(query, results)
+            if isinstance(prepared, dict):
+                return prepared
+            results, context = prepared
             
             # Generate polished response
-            response = self._generate_llm_response(query, context)
-            
             return {
-                "answer": response,
+                "answer": self._generate_llm_response(query, context),
                 "sources": results
             }
+        except Exception as e:
+            return self._canned_response(self._error_message(e))
+
+    def generate_response_stream(self, query: str) -> Dict[str, any]:
+        """
+        Same as generate_response, but "answer" is an iterator of text chunks
+        streamed from the LLM as they arrive (for st.write_stream).
+        """
+        try:
+            results = None if self._is_greeting(query) else self._retrieve(query)
+            prepared = self._prepare(query, results)
+            if isinstance(prepared, dict):
+                prepared["answer"] = iter([prepared["answer"]])
+                return prepared
+            results, context = prepared
             
+            return {
+                "answer": self._stream_llm_response(query, context),
+                "sources": results
+            }
         except Exception as e:
             return {
-                "answer": f"⚠️ Sorry, I encountered an error. Please try again later.\n(Error: {str(e)})",
+                "answer": iter([self._error_message(e)]),
                 "sources": []
             }
 
+    def generate_responses(self, queries: List[str]) -> List[Dict[str, any]]:
+        """
+        Answer several queries at once, embedding and searching them in a
+        single round trip each instead of one per query.
+        """
+        try:
+            # Generate embeddings and search in one batch each (greetings skip both)
+            pending = [i for i, query in enumerate(queries) if not self._is_greeting(query)]
+            all_results: List[Optional[List[Dict]]] = [None] * len(queries)
+            if pending:
+                embeddings = self.embedder.generate_embeddings([queries[i] for i in pending])
+                batch_results = self.vector_db.batch_semantic_search(
+                    query_embeddings=embeddings.tolist(),
+                    threshold=0.65,
+                    limit=3
+                )
+                for i, results in zip(pending, batch_results):
+                    all_results[i] = results
+        except Exception as e:
+            return [self._canned_response(self._error_message(e)) for _ in queries]
+        
+        def answer(query: str, results: Optional[List[Dict]]) -> Dict[str, any]:
+            try:
+                prepared = self._prepare(query, results)
+                if isinstance(prepared, dict):
+                    return prepared
+                results, context = prepared
+                return {
+                    "answer": self._generate_llm_response(query, context),
+                    "sources": results
+                }
+            except Exception as e:
+                return self._canned_response(self._error_message(e))
+        
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as pool:
+            return list(pool.map(answer, queries, all_results))
+
+    async def agenerate_response(self, query: str) -> Dict[str, any]:
+        """Async variant of generate_response"""
+        try:
+            results = None if self._is_greeting(query) else await self._aretrieve(query)
+            prepared = self._prepare(query, results)
+            if isinstance(prepared, dict):
+                return prepared
+            results, context = prepared
+            
+            # Generate polished response
+            return {
+                "answer": await self._chain.ainvoke({
+                    "question": query,
+                    "context": context
+                }),
+                "sources": results
+            }
+        except Exception as e:
+            return self._canned_response(self._error_message(e))
+
+    async def agenerate_responses(self, queries: List[str]) -> List[Dict[str, any]]:
+        """
+        Answer several queries concurrently, with at most
+        MAX_CONCURRENT_REQUESTS pipelines in flight at once.
+        """
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        
+        async def bounded(query: str) -> Dict[str, any]:
+            async with semaphore:
+                return await self.agenerate_response(query)
+        
+        return await asyncio.gather(*(bounded(query) for query in queries))
+
+    def _prepare(
+        self,
+        query: str,
+        results: Optional[List[Dict]]
+    ) -> Union[Dict[str, any], Tuple[List[Dict], str]]:
+        """
+        Steps shared by every entry point before the LLM call.
+        
+        Args:
+            query: User query
+            results: Search results, or None if the query is a greeting
+            
+        Returns:
+            A finished response for greetings and empty results,
+            otherwise (results, context) to hand to the LLM
+        """
+        # Handle greetings
+        if results is None:
+            return self._canned_response(self._rng.choice(self.greeting_responses))
+        
+        # Handle no results
+        if not results:
+            return self._canned_response(self._rng.choice(self.fallback_responses))
+        
+        # Prepare enhanced context
+        return results, self._format_context(results, query)
+
+    def _canned_response(self, answer: str) -> Dict[str, any]:
+        """Response that needs no LLM call and has no sources"""
+        return {
+            "answer": answer,
+            "sources": []
+        }
+
+    def _retrieve(self, query: str) -> List[Dict]:
+        """Embed the query and fetch matching FAQ entries"""
+        query_embedding = self.embedder.generate_embedding(query)
+        return self.vector_db.search(
+            query_embedding=query_embedding,
+            query=query,
+            mode="semantic",
+            threshold=0.65,
+            limit=3
+        )
+
+    async def _aretrieve(self, query: str) -> List[Dict]:
+        """Async variant of _retrieve"""
+        query_embedding = await self.embedder.agenerate_embedding(query)
+        return await self.vector_db.asemantic_search(
+            query_embedding=query_embedding,
+            query=query,
+            threshold=0.65,
+            limit=3
+        )
+
+    def _error_message(self, error: Exception) -> str:
+        """User-facing message for failures while answering"""
+        return f"⚠️ Sorry, I encountered an error. Please try again later.\n(Error: {str(error)})"
+
     def _format_context(self, results: List[Dict], query: str) -> str:
         """Format search results into LLM context"""
+        if not results:
+            return ""
         context_lines = []
         for i, res in enumerate(results, 1):
             context_lines.append(
@@ -123,21 +270,23 @@ class RAGPipeline:
 
     def _generate_llm_response(self, query: str, context: str) -> str:
         """Generate final response using LLM"""
-        chain = LLMChain(llm=self.llm, prompt=self.prompt_template)
-        return chain.run({
+        return self._chain.invoke({
             "question": query,
             "context": context
         })
 
+    def _stream_llm_response(self, query: str, context: str) -> Iterator[str]:
+        """Stream final response from the LLM chunk by chunk"""
+        try:
+            for chunk in self._chain.stream({"question": query, "context": context}):
+                if chunk:
+                    yield chunk
+        except Exception as e:
+            yield self._error_message(e)
+
     def _is_greeting(self, text: str) -> bool:
         """Check if input is a greeting phrase"""
-        greetings = [
-            "hello", "hi", "hey", "greetings", 
-            "good morning", "good afternoon", "good evening",
-            "namaste", "salam", "hola", "hi there", "helloo"
-        ]
-        text = text.lower().strip(" ?!.,")
-        return any(greet in text for greet in greetings)
+        return bool(self._GREETING_RE.match(text))
 
     def _get_helpful_links(self) -> str:
         """Generate dynamic help links"""
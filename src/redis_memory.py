@@ -3,11 +3,42 @@ import json
 from datetime import datetime
 from typing import List, Dict, Optional
 import os
+import threading
 from dotenv import load_dotenv
 
 # Environment variables load karein
 load_dotenv()
 
+# Saare RedisMemory instances ek hi connection pool share karte hain
+_POOL: Optional[redis.ConnectionPool] = None
+_POOL_LOCK = threading.Lock()
+
+def _get_pool() -> redis.ConnectionPool:
+    """
+    Process-wide Redis connection pool (pehli call par banta hai)
+    
+    BlockingConnectionPool saari connections busy hon to error dene ke bajaye
+    wait karta hai, is liye bursty Streamlit traffic mein bhi sockets limited rehte hain.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            pool = redis.BlockingConnectionPool(
+                host=os.getenv("REDIS_HOST", "localhost"),
+                port=int(os.getenv("REDIS_PORT", 6379)),
+                password=os.getenv("REDIS_PASSWORD", None),
+                db=0,
+                decode_responses=True,
+                socket_connect_timeout=5,
+                socket_timeout=5,
+                max_connections=100,
+                timeout=5
+            )
+            # Connection sirf ek baar test karein
+            redis.Redis(connection_pool=pool).ping()
+            _POOL = pool
+    return _POOL
+
 class RedisMemory:
     def __init__(self, session_id: str = "default"):
         """
@@ -20,23 +51,21 @@ class RedisMemory:
             raise ValueError("Session ID must be a non-empty string")
         
         try:
-            # Redis connection establish karein
-            self.redis = redis.Redis(
-                host=os.getenv("REDIS_HOST", "localhost"),
-                port=int(os.getenv("REDIS_PORT", 6379)),
-                password=os.getenv("REDIS_PASSWORD", None),
-                db=0,
-                decode_responses=True,
-                socket_connect_timeout=5,
-                socket_timeout=5
-            )
-            # Test connection
-            self.redis.ping()
+            # Shared pool se Redis client banayein
+            self.redis = redis.Redis(connection_pool=_get_pool())
         except Exception as e:
             raise ConnectionError(f"Failed to connect to Redis: {str(e)}")
 
         self.session_id = session_id
         self.key = f"ecom_chat:{session_id}"
+        
+        # Decoded history ka local cache; har Streamlit rerun par poori list decode na karni pare
+        # st.cache_resource ek hi instance concurrent reruns mein share karta hai, is liye lock zaroori hai
+        self._cache: List[Dict[str, str]] = []
+        self._cache_len: int = 0
+        # Cache ke aakhri message ka raw JSON; Redis se match na kare to cache purana hai
+        self._cache_tail: Optional[str] = None
+        self._cache_lock = threading.Lock()
 
     def add_message(self, user_message: str, assistant_response: str) -> bool:
         """
@@ -60,11 +89,23 @@ class RedisMemory:
                 "assistant": assistant_response
             }
             
-            # Redis mein JSON format mein save karein
-            self.redis.rpush(self.key, json.dumps(message))
+            raw = json.dumps(message)
             
-            # 7 din (604800 seconds) ke baad automatic delete ho jaye
-            self.redis.expire(self.key, 604800)
+            with self._cache_lock:
+                # Dono commands ek hi round trip mein bhejein
+                with self.redis.pipeline(transaction=False) as pipe:
+                    # Redis mein JSON format mein save karein
+                    pipe.rpush(self.key, raw)
+                    
+                    # 7 din (604800 seconds) ke baad automatic delete ho jaye
+                    pipe.expire(self.key, 604800)
+                    new_len, _ = pipe.execute()
+                
+                # Agar beech mein kisi aur ne message nahi dala to cache mein seedha add karein
+                if new_len == self._cache_len + 1:
+                    self._cache.append(message)
+                    self._cache_len = new_len
+                    self._cache_tail = raw
             return True
         except Exception as e:
             print(f"Error saving message: {str(e)}")
@@ -78,17 +119,32 @@ class RedisMemory:
             limit: Kitne recent messages chahiye (None = sab)
             
         Returns:
-            List of message dictionaries
+            List of message dictionaries (copies, cache ko affect nahi karte)
         """
         try:
-            # Redis se messages retrieve karein
-            messages = self.redis.lrange(self.key, 0, -1)
-            
-            # JSON strings ko python dictionaries mein convert karein
-            history = [json.loads(msg) for msg in messages]
-            
-            # Agar limit diya hai to utne hi recent messages return karein
-            return history[-limit:] if limit is not None else history
+            with self._cache_lock:
+                # Length aur cache ke aakhri message ki jagah wala entry ek hi round trip mein layein
+                with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.llen(self.key)
+                    pipe.lindex(self.key, self._cache_len - 1)
+                    length, tail = pipe.execute()
+                
+                # History delete/expire ho gayi ho, ya kisi aur client ne clear karke
+                # naye messages daal diye hon, to cache reset karein
+                if length < self._cache_len or (self._cache_len and tail != self._cache_tail):
+                    self._cache, self._cache_len, self._cache_tail = [], 0, None
+                
+                # Sirf naye messages Redis se layein aur JSON se python dictionaries mein convert karein
+                if length > self._cache_len:
+                    messages = self.redis.lrange(self.key, self._cache_len, -1)
+                    if messages:
+                        self._cache.extend(json.loads(msg) for msg in messages)
+                        self._cache_len = len(self._cache)
+                        self._cache_tail = messages[-1]
+                
+                # Agar limit diya hai to utne hi recent messages return karein
+                history = self._cache[-limit:] if limit else self._cache
+                return [dict(msg) for msg in history]
         except Exception as e:
             print(f"Error retrieving history: {str(e)}")
             return []
@@ -96,11 +152,21 @@ class RedisMemory:
     def clear_history(self) -> bool:
         """Is session ki saari conversation history delete karein"""
         try:
-            return self.redis.delete(self.key) > 0
+            with self._cache_lock:
+                self._cache, self._cache_len, self._cache_tail = [], 0, None
+                return self.redis.delete(self.key) > 0
         except Exception as e:
             print(f"Error clearing history: {str(e)}")
             return False
 
+    def count(self) -> int:
+        """Is session mein kitne messages hain (history decode kiye baghair)"""
+        try:
+            return self.redis.llen(self.key)
+        except Exception as e:
+            print(f"Error counting messages: {str(e)}")
+            return 0
+
     def get_last_message(self) -> Optional[Dict[str, str]]:
         """
         Sabse Latest Message Retrieve Karein
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_processing import _clean_frame, load_dataset
+
+
+def test_clean_frame_returns_native_types():
+    df = pd.DataFrame({
+        "count": [3, 4],
+        "price": [9.99, np.nan],
+        "in_stock": [True, False],
+        "label": ["Orders", None],
+    })
+
+    records = _clean_frame(df).to_dict("records")
+
+    assert records == [
+        {"count": 3, "price": 9.99, "in_stock": True, "label": "Orders"},
+        {"count": 4, "price": None, "in_stock": False, "label": None},
+    ]
+    assert [type(v) for v in records[0].values()] == [int, float, bool, str]
+
+
+def test_faq_chunks_need_no_cleaning():
+    pytest.importorskip("langchain.text_splitter")
+    from src.data_processing import iter_chunks
+
+    chunks = list(iter_chunks(load_dataset("data/synthetic_ecommerce_faq.csv")))
+
+    assert chunks
+    for chunk in chunks:
+        assert type(chunk["text"]) is str
+        for value in chunk["metadata"].values():
+            assert value is None or type(value) in (int, str)
@@ -0,0 +1,93 @@
+import os
+import uuid
+
+import numpy as np
+import pytest
+
+from src.qdrant_client import QdrantVectorStore, clean_metadata
+
+RAW_METADATA = {
+    "count": np.int64(3),
+    "price": np.float64(9.99),
+    "in_stock": np.bool_(True),
+    "discount": None,
+}
+
+EXPECTED_PAYLOAD = {
+    "text": "doc",
+    "count": 3,
+    "price": 9.99,
+    "in_stock": True,
+    "discount": None,
+}
+
+
+def assert_same_types(actual, expected):
+    assert actual == expected
+    for key, value in expected.items():
+        assert type(actual[key]) is type(value), key
+
+
+def test_clean_metadata_returns_native_types():
+    cleaned = clean_metadata({
+        **RAW_METADATA,
+        "score": np.float32(0.5),
+        "int_string": "12",
+        "float_string": "1.5",
+        "label": "Orders",
+        "flag": False,
+        "tags": ["a"],
+    })
+
+    assert_same_types(cleaned, {
+        "count": 3,
+        "price": 9.99,
+        "in_stock": True,
+        "discount": None,
+        "score": 0.5,
+        "int_string": 12,
+        "float_string": 1.5,
+        "label": "Orders",
+        "flag": False,
+        "tags": "['a']",
+    })
+
+
+def round_trip(store, metadata=RAW_METADATA, **upload_kwargs):
+    store.create_collection(vector_size=4)
+    try:
+        # Default arguments must make numpy metadata safe for gRPC
+        store.upload_data(
+            ["doc"],
+            np.ones((1, 4), dtype=np.float32),
+            [metadata],
+            **upload_kwargs
+        )
+
+        point = store.client.retrieve(store.collection_name, ids=[0], with_payload=True)[0]
+        assert_same_types(point.payload, EXPECTED_PAYLOAD)
+
+        hits = store.semantic_search([1.0, 1.0, 1.0, 1.0], threshold=0.5, limit=1)
+        assert len(hits) == 1
+        assert hits[0]["text"] == "doc"
+        assert_same_types(hits[0]["metadata"], {k: v for k, v in EXPECTED_PAYLOAD.items() if k != "text"})
+    finally:
+        store.client.delete_collection(store.collection_name)
+
+
+def test_payload_round_trip_in_memory():
+    round_trip(QdrantVectorStore(collection_name="round_trip", location=":memory:"))
+
+
+def test_native_payload_round_trip_without_cleaning():
+    native = {k: v for k, v in EXPECTED_PAYLOAD.items() if k != "text"}
+    round_trip(
+        QdrantVectorStore(collection_name="round_trip", location=":memory:"),
+        metadata=native,
+        clean=False
+    )
+
+
+@pytest.mark.skipif(not os.getenv("QDRANT_URL"), reason="needs a Qdrant server (QDRANT_URL)")
+def test_payload_round_trip_over_grpc():
+    round_trip(QdrantVectorStore(collection_name=f"round_trip_{uuid.uuid4().hex[:8]}"))